@@ -6,7 +6,8 @@ import time
 import argparse
 from datetime import datetime
 from tqdm import tqdm
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, Manager, cpu_count, TimeoutError as PoolTimeout
+from collections import deque
 import re
 
 # ---------------------------
@@ -30,7 +31,25 @@ parser.add_argument("--result-dir", type=str,
                     help="Diretório personalizado para resultados .sca (opcional)")
 parser.add_argument("--out", type=str, default="/home/felipe/Documentos/tcc/omnet/Run_Simulations_Simu5G/Resultados",
                     help="Pasta de saída para logs e arquivos de status (default: caminho fixo predefinido)")
+parser.add_argument("--full-log", action="store_true",
+                    help="Grava toda a saída do opp_run no log (default: só as últimas --log-tail linhas)")
+parser.add_argument("--log-tail", type=int, default=200,
+                    help="Linhas mantidas em memória (ring buffer) e gravadas no log sem --full-log (mínimo: 20, default: 200)")
+parser.add_argument("--pin", choices=["none", "core"], default="none",
+                    help="Posicionamento dos opp_run: none (livre) | core (um core físico dedicado por execução)")
+parser.add_argument("--cpuset", type=str,
+                    help='Restringe --pin core a estes CPUs lógicos. Ex.: "0-15,32-47"')
+parser.add_argument("--numa-node", type=int,
+                    help="Restringe --pin core aos CPUs deste nó NUMA")
+parser.add_argument("--warmup-json", type=str,
+                    help="JSON gerado por detectar_warmup.py com warmup_period_s e sim_time_limit_s")
+parser.add_argument("--warmup-period", type=float,
+                    help="Sobrescreve warmup-period (s) do .ini (tem precedência sobre --warmup-json)")
+parser.add_argument("--sim-time-limit", type=float,
+                    help="Sobrescreve sim-time-limit (s) do .ini (tem precedência sobre --warmup-json)")
 args = parser.parse_args()
+if args.log_tail < 20:
+    parser.error("--log-tail deve ser >= 20 (o status de falha guarda as últimas 20 linhas)")
 
 # ---------------------------
 # Config principais
@@ -43,6 +62,9 @@ TX_POWERS = parse_tx_list(args.tx)
 NUM_REPETITIONS = args.reps
 NUM_PROCESSES = min(args.threads, cpu_count())
 MAX_RETRIES = 3
+LOG_TAIL_LINES = args.log_tail
+FULL_LOG = args.full_log
+PROGRESS_REFRESH_SEC = 1.0
 
 OMNETPP_BIN_DIR = "/home/felipe/omnetpp-6.1.0-linux-x86_64/omnetpp-6.1/bin" # Ajuste conforme necessário
 # Usar argumento da linha de comando se fornecido, senão usar o valor padrão
@@ -70,6 +92,82 @@ def get_paths_for_tx(tx: str):
 OUT_DIR = args.out
 os.makedirs(OUT_DIR, exist_ok=True)
 
+# Warm-up / duração (None = mantém o valor do .ini)
+WARMUP_PERIOD = args.warmup_period
+SIM_TIME_LIMIT = args.sim_time_limit
+if args.warmup_json:
+    with open(args.warmup_json) as f:
+        warmup_rec = json.load(f)
+    if WARMUP_PERIOD is None:
+        WARMUP_PERIOD = warmup_rec.get("warmup_period_s")
+    if SIM_TIME_LIMIT is None:
+        SIM_TIME_LIMIT = warmup_rec.get("sim_time_limit_s")
+if WARMUP_PERIOD is not None and SIM_TIME_LIMIT is not None and SIM_TIME_LIMIT <= WARMUP_PERIOD:
+    raise SystemExit(f"❌ sim-time-limit ({SIM_TIME_LIMIT}s) deve ser maior que warmup-period ({WARMUP_PERIOD}s)")
+
+# ---------------------------
+# Posicionamento (afinidade de CPU)
+# ---------------------------
+SYS_CPU_DIR = "/sys/devices/system/cpu"
+SYS_NODE_DIR = "/sys/devices/system/node"
+
+def parse_cpulist(raw: str):
+    """Converte uma lista de CPUs no formato do kernel ("0-3,8,10-11") em um set."""
+    cpus = set()
+    for part in raw.strip().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.update(range(int(lo), int(hi) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+def read_cpulist(path: str):
+    with open(path) as f:
+        return parse_cpulist(f.read())
+
+def physical_core_cpus(allowed):
+    """
+    Escolhe um CPU lógico por core físico dentro de `allowed`,
+    evitando colocar duas execuções em irmãos de hyperthreading.
+    """
+    seen, cpus = set(), []
+    for cpu in sorted(allowed):
+        try:
+            siblings = frozenset(read_cpulist(
+                os.path.join(SYS_CPU_DIR, f"cpu{cpu}", "topology", "thread_siblings_list")))
+        except OSError:
+            siblings = frozenset({cpu})
+        if siblings in seen:
+            continue
+        seen.add(siblings)
+        cpus.append(cpu)
+    return cpus
+
+def resolve_placement():
+    """
+    Retorna a lista de CPUs (um por core físico) usada com --pin core,
+    ou None quando as execuções ficam livres para o escalonador.
+    """
+    if args.pin == "none":
+        return None
+    allowed = set(os.sched_getaffinity(0))
+    if args.cpuset:
+        allowed &= parse_cpulist(args.cpuset)
+    if args.numa_node is not None:
+        node_list = os.path.join(SYS_NODE_DIR, f"node{args.numa_node}", "cpulist")
+        try:
+            allowed &= read_cpulist(node_list)
+        except OSError:
+            raise SystemExit(f"❌ Nó NUMA {args.numa_node} não encontrado ({node_list})")
+    cpus = physical_core_cpus(allowed)
+    if not cpus:
+        raise SystemExit("❌ Nenhum CPU disponível para --pin core com o cpuset/nó NUMA informado")
+    return cpus
+
 # ---------------------------
 # Montagem do comando opp_run
 # ---------------------------
@@ -79,12 +177,15 @@ def build_command(tx: str, rep: int):
     - Aplica potência nas gNBs (*.gnb[*].cellularNic.phy.eNodeBTxPower)
     - Aplica potência nos UEs (**.ueTxPower)
     - Redireciona resultados para RESULT_DIR (--result-dir)
+    - Sobrescreve warmup-period/sim-time-limit quando informados (--warmup-json etc.)
+    - Ativa cmdenv-autoflush: com stdout em pipe, sem flush o progresso chega em rajadas atrasadas
     """
     result_dir, _, _, _ = get_paths_for_tx(tx)
-    return [
+    cmd = [
         os.path.join(OMNETPP_BIN_DIR, "opp_run"),
         "-r", str(rep),
         "-m", "-u", "Cmdenv",
+        "--cmdenv-autoflush=true",
         "-c", CONFIG_NAME,
         "-f", INI_PATH,
         "--result-dir", result_dir,
@@ -100,10 +201,144 @@ def build_command(tx: str, rep: int):
         f"--*.gnb[*].cellularNic.phy.eNodeBTxPower={tx}dBm",
         f"--**.ueTxPower={tx}dBm",
     ]
+    if WARMUP_PERIOD is not None:
+        cmd.append(f"--warmup-period={WARMUP_PERIOD}s")
+    if SIM_TIME_LIMIT is not None:
+        cmd.append(f"--sim-time-limit={SIM_TIME_LIMIT}s")
+    return cmd
+
+# ---------------------------
+# Progresso do Cmdenv (express mode)
+# ---------------------------
+# Exemplo de saída do Cmdenv:
+#   ** Event #1792   t=0.0355   Elapsed: 2.00044s (0m 02s)  17% completed  (17% total)
+#        Speed:     ev/sec=895.603   simsec/sec=0.0177431   ev/simsec=50476.1
+RE_CMDENV_EVENT = re.compile(r"\*\*\s+Event\s+#(\d+)\s+t=(\S+)\s+Elapsed:\s+([0-9.eE+-]+)s")
+RE_CMDENV_PCT = re.compile(r"(\d+)% completed")
+RE_CMDENV_SPEED = re.compile(r"ev/sec=(\S+)\s+simsec/sec=(\S+)")
+
+def parse_cmdenv_line(line: str, state: dict) -> bool:
+    """
+    Atualiza `state` com o progresso lido de uma linha do Cmdenv.
+    Retorna True se a linha era de progresso.
+    """
+    m = RE_CMDENV_EVENT.search(line)
+    if m:
+        try:
+            state["events"] = int(m.group(1))
+            state["sim_time_s"] = float(m.group(2).rstrip("s"))
+            state["elapsed_sec"] = float(m.group(3))
+        except ValueError:
+            return False
+        pct = RE_CMDENV_PCT.search(line)
+        if pct:
+            state["fraction"] = min(int(pct.group(1)), 100) / 100.0
+        return True
+    m = RE_CMDENV_SPEED.search(line)
+    if m:
+        try:
+            ev_s, simsec_s = float(m.group(1)), float(m.group(2))
+        except ValueError:
+            return False
+        state["ev_per_sec"] = ev_s
+        state["simsec_per_sec"] = simsec_s
+        state["ev_per_sec_sum"] = state.get("ev_per_sec_sum", 0.0) + ev_s
+        state["speed_samples"] = state.get("speed_samples", 0) + 1
+        return True
+    return False
+
+def estimate_run_eta(state: dict):
+    """ETA (s) de uma execução a partir do % concluído informado pelo Cmdenv."""
+    frac, elapsed = state.get("fraction"), state.get("elapsed_sec")
+    if not frac or elapsed is None:
+        return None
+    return elapsed * (1.0 - frac) / frac
+
+def fmt_eta(sec):
+    if sec is None:
+        return "?"
+    sec = int(round(sec))
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h{m:02d}m{s:02d}s" if h else f"{m}m{s:02d}s"
+
+# Dicionário compartilhado (Manager) com o progresso das execuções ativas
+PROGRESS = None
+# Fila compartilhada (Manager) com os CPUs livres quando --pin core
+FREE_CPUS = None
+
+def init_worker(progress, free_cpus=None):
+    global PROGRESS, FREE_CPUS
+    PROGRESS = progress
+    FREE_CPUS = free_cpus
+
+def publish_progress(key: str, state: dict):
+    if PROGRESS is None:
+        return
+    try:
+        PROGRESS[key] = {
+            "fraction": state.get("fraction"),
+            "eta_sec": estimate_run_eta(state),
+            "ev_per_sec": state.get("ev_per_sec"),
+        }
+    except Exception:
+        pass
+
+def clear_progress(key: str):
+    if PROGRESS is None:
+        return
+    try:
+        PROGRESS.pop(key, None)
+    except Exception:
+        pass
 
 # ---------------------------
 # Execução de uma simulação (com tentativas)
 # ---------------------------
+def run_opp(tx: str, rep: int, log_file: str, key: str, cpu=None):
+    """
+    Executa o opp_run lendo a saída por pipe.
+    Mantém apenas as últimas LOG_TAIL_LINES linhas em memória; com --full-log
+    grava tudo no log, senão grava somente o tail ao final (também em caso de erro).
+    Se `cpu` for informado, o processo filho é fixado nesse CPU.
+    """
+    state = {}
+    tail = deque(maxlen=LOG_TAIL_LINES)
+    log = open(log_file, "w") if FULL_LOG else None
+    proc = None
+    try:
+        proc = subprocess.Popen(
+            build_command(tx, rep),
+            cwd=SIMU5G_PROJECT_ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            preexec_fn=(lambda: os.sched_setaffinity(0, {cpu})) if cpu is not None else None
+        )
+        for line in proc.stdout:
+            tail.append(line)
+            if log:
+                log.write(line)
+            if parse_cmdenv_line(line, state):
+                publish_progress(key, state)
+        proc.stdout.close()
+        state["returncode"] = proc.wait()
+    except BaseException:
+        # erro ou Ctrl-C durante a leitura: não deixa o opp_run órfão
+        if proc is not None:
+            proc.kill()
+            proc.wait()
+        raise
+    finally:
+        if log:
+            log.close()
+        else:
+            with open(log_file, "w") as f:
+                f.writelines(tail)
+    return state, tail
+
 def run_job(job):
     tx, rep = job["tx"], job["rep"]
     result_dir, log_dir, _, _ = get_paths_for_tx(tx)
@@ -114,53 +349,97 @@ def run_job(job):
     success = False
     log_file = os.path.join(log_dir, f"log_TX{tx}_R{rep}.txt")
     sca_file = os.path.join(result_dir, CONFIG_NAME, f"{rep}.sca")
+    key = f"{tx}:{rep}"
     start_time = time.time()
+    state, tail = {}, []
+    cpu = FREE_CPUS.get() if FREE_CPUS is not None else None
+
+    try:
+        while attempt < MAX_RETRIES and not success:
+            print(f"▶️ TX={tx}dBm | Repetição={rep} | Tentativa={attempt + 1}" +
+                  (f" | CPU={cpu}" if cpu is not None else ""))
+            state, tail = run_opp(tx, rep, log_file, key, cpu)
+            time.sleep(1)
+            success = os.path.exists(sca_file)
+            duration = time.time() - start_time
 
-    while attempt < MAX_RETRIES and not success:
-        with open(log_file, "w") as log:
-            print(f"▶️ TX={tx}dBm | Repetição={rep} | Tentativa={attempt + 1}")
-            subprocess.run(
-                build_command(tx, rep),
-                cwd=SIMU5G_PROJECT_ROOT,
-                stdout=log,
-                stderr=subprocess.STDOUT,
-                text=True
-            )
-        time.sleep(1)
-        success = os.path.exists(sca_file)
-        duration = time.time() - start_time
-
-        attempt += 1
+            attempt += 1
+    finally:
+        clear_progress(key)
+        if cpu is not None:
+            FREE_CPUS.put(cpu)
 
+    samples = state.get("speed_samples", 0)
     result = {
         "tx_power_dBm": tx,
         "repetition": rep,
         "attempts": attempt,
         "success": success,
+        "returncode": state.get("returncode"),
         "sca_expected": sca_file,
         "log_path": log_file,
+        "cpu": cpu,
         "duration_sec": round(duration, 2),
+        "sim_time_s": state.get("sim_time_s"),
+        "events": state.get("events"),
+        "ev_per_sec": round(state["ev_per_sec_sum"] / samples, 2) if samples else None,
         "timestamp": datetime.now().isoformat()
     }
 
     if not success:
-        try:
-            with open(log_file, "r") as f:
-                tail = f.readlines()[-20:]
-            result["log_tail"] = tail
-        except Exception:
-            result["log_tail"] = ["[Erro ao ler o log]"]
+        result["log_tail"] = list(tail)[-20:] or ["[Sem saída do opp_run]"]
 
     return result
 
+def campaign_postfix(progress, finished: int, total: int, campaign_start: float):
+    """Resumo para a barra: ETA da execução mais lenta, ETA da campanha e ev/sec agregado."""
+    active = list(progress.values())
+    done = finished + sum(a["fraction"] or 0.0 for a in active)
+    elapsed = time.time() - campaign_start
+    eta_total = elapsed * (total - done) / done if done > 0 else None
+    run_etas = [a["eta_sec"] for a in active if a["eta_sec"] is not None]
+    ev_s = sum(a["ev_per_sec"] or 0.0 for a in active)
+    return {
+        "ev/s": f"{ev_s:.0f}",
+        "eta_exec": fmt_eta(max(run_etas) if run_etas else None),
+        "eta_total": fmt_eta(eta_total),
+    }
+
 # ---------------------------
 # Execução
 # ---------------------------
 if not args.skip_sim:
+    PINNED_CPUS = resolve_placement()
+    if PINNED_CPUS is not None and len(PINNED_CPUS) < NUM_PROCESSES:
+        print(f"⚠️  Apenas {len(PINNED_CPUS)} cores físicos disponíveis: paralelismo reduzido de {NUM_PROCESSES}")
+        NUM_PROCESSES = len(PINNED_CPUS)
+    placement = {
+        "mode": args.pin,
+        "cpuset": args.cpuset,
+        "numa_node": args.numa_node,
+        "cpus": PINNED_CPUS[:NUM_PROCESSES] if PINNED_CPUS is not None else None,
+    }
+
     print(f"🚀 Iniciando simulações OMNeT++ | potências={TX_POWERS} dBm | repetições={NUM_REPETITIONS} | paralelismo={NUM_PROCESSES}")
     print(f"📂 Simu5G: {SIMU5G_PROJECT_ROOT}")
     print(f"📂 Resultados: {RESULT_BASE}")
-    
+    if PINNED_CPUS is not None:
+        print(f"📌 Execuções fixadas nos CPUs: {placement['cpus']}")
+    if WARMUP_PERIOD is not None or SIM_TIME_LIMIT is not None:
+        fmt_s = lambda v: f"{v}s" if v is not None else "valor do .ini"
+        print(f"⏱  warmup-period={fmt_s(WARMUP_PERIOD)} | sim-time-limit={fmt_s(SIM_TIME_LIMIT)}")
+
+    manager = Manager()
+    progress = manager.dict()
+    free_cpus = None
+    if PINNED_CPUS is not None:
+        free_cpus = manager.Queue()
+        for cpu in placement["cpus"]:
+            free_cpus.put(cpu)
+    total_runs = len(TX_POWERS) * NUM_REPETITIONS
+    finished_runs = 0
+    campaign_start = time.time()
+
     for tx in TX_POWERS:
         result_dir, log_dir, status_path, failed_path = get_paths_for_tx(tx)
         os.makedirs(result_dir, exist_ok=True)
@@ -169,19 +448,37 @@ if not args.skip_sim:
         # Jobs desta potência
         jobs = [{"tx": tx, "rep": rep} for rep in range(NUM_REPETITIONS)]
         results = []
-        with Pool(processes=NUM_PROCESSES) as pool:
+        tx_start = time.time()
+        with Pool(processes=NUM_PROCESSES, initializer=init_worker, initargs=(progress, free_cpus)) as pool:
             with tqdm(total=len(jobs), desc=f"Simulações TX={tx}dBm", unit="exec") as pbar:
-                for res in pool.imap_unordered(run_job, jobs):
+                it = pool.imap_unordered(run_job, jobs)
+                while len(results) < len(jobs):
+                    try:
+                        res = it.next(timeout=PROGRESS_REFRESH_SEC)
+                    except PoolTimeout:
+                        pbar.set_postfix(campaign_postfix(progress, finished_runs, total_runs, campaign_start))
+                        continue
                     results.append(res)
+                    finished_runs += 1
+                    pbar.set_postfix(campaign_postfix(progress, finished_runs, total_runs, campaign_start), refresh=False)
                     pbar.update(1)
+        tx_wall = time.time() - tx_start
 
         # Persistência do status por potência
         failed = [r for r in results if not r["success"]]
+        speeds = [r["ev_per_sec"] for r in results if r["success"] and r["ev_per_sec"]]
         with open(status_path, "w") as f:
             json.dump({
                 "tx_power_dBm": tx,
                 "repetitions": NUM_REPETITIONS,
                 "result_dir": result_dir,
+                "ev_per_sec_mean": round(sum(speeds) / len(speeds), 2) if speeds else None,
+                "wall_time_sec": round(tx_wall, 2),
+                "sims_per_hour": round((len(results) - len(failed)) * 3600.0 / tx_wall, 2) if tx_wall > 0 else None,
+                "parallelism": NUM_PROCESSES,
+                "warmup_period_s": WARMUP_PERIOD,
+                "sim_time_limit_s": SIM_TIME_LIMIT,
+                "placement": placement,
                 "runs": results
             }, f, indent=2, ensure_ascii=False)
         if failed:
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os, re, json, argparse, statistics, math
+import os, re, sys, json, argparse, statistics, math, hashlib
 from pathlib import Path
 from collections import defaultdict
 import matplotlib.pyplot as plt
@@ -22,6 +22,63 @@ CHART_CHOICES  = ["per-solution", "comparisons", "scatter"]
 def _enabled(target: str, selected: list[str]) -> bool:
     return ("all" in selected) or (target in selected)
 
+# ---------------------------
+# Cache de gráficos (fingerprint dos dados)
+# ---------------------------
+CHART_DPI = 300
+PREVIEW_DPI = 72
+CHART_STYLE_VERSION = 1          # incremente ao mudar o estilo dos gráficos
+CHART_MANIFEST = "manifest_graficos.json"
+PREVIEW_SUBDIR = "preview"
+
+_chart_cfg = {"dpi": CHART_DPI, "force": False, "preview": False}
+_chart_stats = {"drawn": 0, "skipped": 0}
+_manifests = {}
+
+def _load_manifest(out_dir: Path) -> dict:
+    key = str(out_dir)
+    if key not in _manifests:
+        mpath = out_dir / CHART_MANIFEST
+        try:
+            _manifests[key] = json.loads(mpath.read_text())
+        except (OSError, ValueError):
+            _manifests[key] = {}
+    return _manifests[key]
+
+def chart_fingerprint(payload: dict) -> str:
+    """Hash das séries, rótulos e estilo (inclui dpi) de um gráfico."""
+    payload = dict(payload, dpi=_chart_cfg["dpi"], style=CHART_STYLE_VERSION)
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _chart_target(out_png) -> Path:
+    """Com --preview, grava em <pasta>/preview/ (manifesto próprio), sem tocar nos PNGs finais."""
+    out_png = Path(out_png)
+    if _chart_cfg["preview"]:
+        return ensure_dir(out_png.parent/PREVIEW_SUBDIR)/out_png.name
+    return out_png
+
+def chart_is_fresh(out_png, payload: dict):
+    """Retorna (atualizado?, fingerprint). Atualizado = PNG existe e o fingerprint não mudou."""
+    out_png = _chart_target(out_png)
+    fp = chart_fingerprint(payload)
+    manifest = _load_manifest(out_png.parent)
+    fresh = (not _chart_cfg["force"]) and out_png.exists() and manifest.get(out_png.name) == fp
+    if fresh:
+        _chart_stats["skipped"] += 1
+    return fresh, fp
+
+def save_chart(out_png, fp: str):
+    """Salva a figura corrente e registra o fingerprint no manifesto da pasta."""
+    out_png = _chart_target(out_png)
+    plt.savefig(out_png, dpi=_chart_cfg["dpi"])
+    plt.close()
+    manifest = _load_manifest(out_png.parent)
+    manifest[out_png.name] = fp
+    with open(out_png.parent/CHART_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    _chart_stats["drawn"] += 1
+
 # ---------------------------
 # Regex
 # ---------------------------
@@ -81,6 +138,57 @@ def safe_mean(values, default=0.0):
     vals = _finite(values)
     return (sum(vals)/len(vals)) if vals else default
 
+# ---------------------------
+# Acumuladores (agregação em memória constante)
+# ---------------------------
+# sum() de floats usa soma compensada (Neumaier) a partir do Python 3.12
+SUM_IS_COMPENSATED = sys.version_info >= (3, 12)
+
+def acc_new():
+    return {"n": 0, "sum": 0, "comp": 0.0, "mean": 0.0, "m2": 0.0, "min": None, "max": None}
+
+def acc_add(acc: dict, v):
+    """Adiciona um valor (ignora NaN/Inf, como safe_mean). Welford para mean/M2."""
+    if not isinstance(v, (int, float)) or not math.isfinite(v):
+        return
+    acc["n"] += 1
+    # soma igual à do sum() embutido: no 3.12+, compensação de Neumaier só depois que o total
+    # já é float (o primeiro float após um prefixo de ints é somado sem compensação)
+    total = acc["sum"]
+    if SUM_IS_COMPENSATED and isinstance(total, float) and isinstance(v, float):
+        t = total + v
+        if abs(total) >= abs(v):
+            acc["comp"] += (total - t) + v
+        else:
+            acc["comp"] += (v - t) + total
+        acc["sum"] = t
+    else:
+        acc["sum"] = total + v
+    delta = v - acc["mean"]
+    acc["mean"] += delta / acc["n"]
+    acc["m2"] += delta * (v - acc["mean"])
+    acc["min"] = v if acc["min"] is None else min(acc["min"], v)
+    acc["max"] = v if acc["max"] is None else max(acc["max"], v)
+
+def acc_mean(acc: dict, default=0.0):
+    # mesmo resultado de safe_mean sobre os valores na mesma ordem
+    if not acc["n"]:
+        return default
+    total, comp = acc["sum"], acc["comp"]
+    if comp and math.isfinite(comp):
+        total += comp
+    return total / acc["n"]
+
+def acc_stats(acc: dict) -> dict:
+    n = acc["n"]
+    return {
+        "count": n,
+        "mean": acc_mean(acc, default=None),
+        "std": math.sqrt(acc["m2"] / (n - 1)) if n > 1 else 0.0,
+        "min": acc["min"],
+        "max": acc["max"],
+    }
+
 def solution_to_solucao(name: str) -> str:
     if name.lower().startswith("solucao") and len(name) > 8 and name[8:].isdigit():
         return f"Solução{name[8:]}"
@@ -180,9 +288,17 @@ def compute_global_eff_index(thp_mbps, energy_j, delay_ms, cfg: dict):
 # Gráficos auxiliares
 # ---------------------------
 def plot_xy_multi(power_axis, series_by_solution, ylabel, title, out_png):
+    series = [(sol_name, [ys.get(p, 0.0) for p in power_axis])
+              for sol_name, ys in series_by_solution.items()]
+    fresh, fp = chart_is_fresh(out_png, {
+        "kind": "xy_multi", "x": list(power_axis), "series": series,
+        "ylabel": ylabel, "title": title
+    })
+    if fresh:
+        return
+
     plt.figure(figsize=(9.5,5))
-    for sol_name, ys in series_by_solution.items():
-        yplotted = [ys.get(p, 0.0) for p in power_axis]
+    for sol_name, yplotted in series:
         plt.plot(power_axis, yplotted, marker="o", label=sol_name)
     plt.xlabel("Potência (dBm)")
     plt.ylabel(ylabel)
@@ -190,11 +306,18 @@ def plot_xy_multi(power_axis, series_by_solution, ylabel, title, out_png):
     plt.grid(True, linestyle=":")
     plt.legend(loc="lower right")
     plt.tight_layout()
-    plt.savefig(out_png, dpi=300)
-    plt.close()
+    save_chart(out_png, fp)
 
 def plot_grouped_bars_by_power(labels_solucoes, power_axis, values_by_power, ylabel, title, out_png):
     import numpy as np
+    fresh, fp = chart_is_fresh(out_png, {
+        "kind": "grouped_bars", "labels": list(labels_solucoes), "x": list(power_axis),
+        "values": [[p, values_by_power.get(p, [0.0]*len(labels_solucoes))] for p in power_axis],
+        "ylabel": ylabel, "title": title
+    })
+    if fresh:
+        return
+
     fig, ax = plt.subplots(figsize=(max(10, 1.3*len(labels_solucoes)), 5))
     x = np.arange(len(labels_solucoes))
     n = len(power_axis)
@@ -212,46 +335,123 @@ def plot_grouped_bars_by_power(labels_solucoes, power_axis, values_by_power, yla
     ax.grid(axis="y", linestyle=":", alpha=0.6)
     ax.legend(title="Potência", loc="lower right")
     fig.tight_layout()
-    plt.savefig(out_png, dpi=300)
-    plt.close()
+    save_chart(out_png, fp)
+
+def plot_scatter_energy_delay(energy, delay, sizes, colors, color_map, out_png):
+    fresh, fp = chart_is_fresh(out_png, {
+        "kind": "scatter", "E": energy, "D": delay, "S": sizes, "C": colors,
+        "legend": list(color_map.items())
+    })
+    if fresh:
+        return
+
+    plt.figure(figsize=(10,6))
+    plt.scatter(energy, delay, s=sizes, c=colors,
+                cmap="tab10", alpha=0.8, edgecolors="k", linewidths=0.3)
+    import matplotlib.patches as mpatches
+    handles = [mpatches.Patch(color=plt.cm.tab10(idx), label=sol)
+               for sol, idx in color_map.items()]
+    plt.legend(handles=handles, loc="lower right", title="Soluções")
+    plt.xlabel("Energia total (kWh)")
+    plt.ylabel("Delay médio (ms)")
+    plt.title("Eficiência: Energia × Delay (tamanho = Vazão em Mbps)")
+    plt.grid(True, linestyle=":")
+    plt.tight_layout()
+    save_chart(out_png, fp)
 
 # ---------------------------
 # Processamento por solução
 # ---------------------------
+# chave do acumulador -> campo da linha de parse_sca
+AGG_FIELDS = {
+    "thp": "sum_rate_mbps",
+    "dly": "mean_delay_ms",
+    "proc_mean": "custo_computacional_gops_media_gnb",
+    "proc_sum": "custo_computacional_gops_soma",
+    "ues_active": "ue_active_count",
+    "gnb_count": "gnb_count",
+}
+
+def aggregate_stream(topology_dir: Path, out_dir: Path):
+    """
+    Modo streaming: grava cada linha em resumo_por_arquivo.jsonl assim que o .sca é extraído
+    e agrega por potência com acumuladores (memória constante nas linhas).
+    Para manter a ordem de soma do modo normal, os .sca são lidos em ordem de nome; só os
+    nomes ficam em memória. Retorna None se não houver .sca.
+    """
+    with os.scandir(topology_dir) as it:
+        names = sorted(e.name for e in it if e.name.endswith(".sca") and e.is_file())
+    if not names:
+        return None
+
+    agg = defaultdict(lambda: {k: acc_new() for k in AGG_FIELDS})
+    with open(out_dir/"resumo_por_arquivo.jsonl", "w") as jsonl:
+        for name in names:
+            r = parse_sca(topology_dir/name)
+            jsonl.write(json.dumps(r, ensure_ascii=False) + "\n")
+            if r["p_dbm"] is None:
+                continue
+            for k, field in AGG_FIELDS.items():
+                acc_add(agg[r["p_dbm"]][k], r[field])
+
+    with open(out_dir/"estatisticas_por_potencia.json","w") as f:
+        json.dump([
+            {"potencia_dbm": p, **{AGG_FIELDS[k]: acc_stats(agg[p][k]) for k in AGG_FIELDS}}
+            for p in sorted(agg.keys())
+        ], f, indent=2, ensure_ascii=False)
+    return agg
+
 def process_topology(topology_dir: Path, out_dir: Path, energy_cfg: dict | None,
-                     metrics: list[str], charts: list[str]):
+                     metrics: list[str], charts: list[str], stream: bool = False):
+    """
+    stream=False: resumo_por_arquivo.json (array JSON com todas as linhas).
+    stream=True:  resumo_por_arquivo.jsonl + estatisticas_por_potencia.json (ver aggregate_stream).
+    Os dois modos geram o mesmo resumo_por_potencia.json.
+    """
     ensure_dir(out_dir)
-    sca_files = sorted(topology_dir.glob("*.sca"))
-    if not sca_files:
+
+    if stream:
+        agg = aggregate_stream(topology_dir, out_dir) if topology_dir.is_dir() else None
+        mean = acc_mean
+    else:
+        sca_files = sorted(topology_dir.glob("*.sca"))
+        agg = None
+        if sca_files:
+            rows = [parse_sca(s) for s in sca_files if s.is_file()]
+            with open(out_dir/"resumo_por_arquivo.json","w") as f:
+                json.dump(rows, f, indent=2, ensure_ascii=False)
+
+            agg = defaultdict(lambda: {k: [] for k in AGG_FIELDS})
+            for r in rows:
+                if r["p_dbm"] is None:
+                    continue
+                for k, field in AGG_FIELDS.items():
+                    agg[r["p_dbm"]][k].append(r[field])
+        mean = safe_mean
+
+    if agg is None:
         print(f"[WARN] Sem .sca em {topology_dir}")
         return None
 
-    rows = [parse_sca(s) for s in sca_files if s.is_file()]
-    with open(out_dir/"resumo_por_arquivo.json","w") as f:
-        json.dump(rows, f, indent=2, ensure_ascii=False)
-
-    agg = defaultdict(lambda: {
-        "thp":[], "dly":[], "proc_mean":[], "proc_sum":[], "ues_active":[], "gnb_count":[]
-    })
-
-    for r in rows:
-        if r["p_dbm"] is None:
-            continue
-        p = r["p_dbm"]
-        agg[p]["thp"].append(r["sum_rate_mbps"])
-        agg[p]["dly"].append(r["mean_delay_ms"])
-        agg[p]["proc_mean"].append(r["custo_computacional_gops_media_gnb"])
-        agg[p]["proc_sum"].append(r["custo_computacional_gops_soma"])
-        agg[p]["ues_active"].append(r["ue_active_count"])
-        agg[p]["gnb_count"].append(r["gnb_count"])
+    # remove as saídas do outro modo, que não corresponderiam a este resumo_por_potencia.json
+    stale = ["resumo_por_arquivo.json"] if stream else ["resumo_por_arquivo.jsonl", "estatisticas_por_potencia.json"]
+    for name in stale:
+        (out_dir/name).unlink(missing_ok=True)
 
     powers = sorted(agg.keys())
-    thp_series      = [safe_mean(agg[p]["thp"])       for p in powers]
-    delay_series    = [safe_mean(agg[p]["dly"])       for p in powers]
-    proc_mean_series= [safe_mean(agg[p]["proc_mean"]) for p in powers]
-    proc_sum_series = [safe_mean(agg[p]["proc_sum"])  for p in powers]
-    ues_act_series  = [safe_mean(agg[p]["ues_active"])for p in powers]
-    gnb_count_ser   = [int(round(safe_mean(agg[p]["gnb_count"], 0))) for p in powers]
+    thp_series      = [mean(agg[p]["thp"])       for p in powers]
+    delay_series    = [mean(agg[p]["dly"])       for p in powers]
+    proc_mean_series= [mean(agg[p]["proc_mean"]) for p in powers]
+    proc_sum_series = [mean(agg[p]["proc_sum"])  for p in powers]
+    ues_act_series  = [mean(agg[p]["ues_active"])for p in powers]
+    gnb_count_ser   = [int(round(mean(agg[p]["gnb_count"], 0))) for p in powers]
+
+    if stream:
+        with open(out_dir/"estatisticas_por_potencia.json","w") as f:
+            json.dump([
+                {"potencia_dbm": p, **{AGG_FIELDS[k]: acc_stats(agg[p][k]) for k in AGG_FIELDS}}
+                for p in powers
+            ], f, indent=2, ensure_ascii=False)
 
     # Tabela por potência (inclui energia/eficiência quando cfg fornecido)
     table = []
@@ -441,20 +641,10 @@ def comparisons_all_solutions(topologies_data, out_root: Path, energy_cfg: dict
             )
 
         if _enabled("scatter", charts):
-            plt.figure(figsize=(10,6))
-            sc = plt.scatter(scatter_E, scatter_D, s=scatter_S, c=scatter_C,
-                             cmap="tab10", alpha=0.8, edgecolors="k", linewidths=0.3)
-            import matplotlib.patches as mpatches
-            handles = [mpatches.Patch(color=plt.cm.tab10(idx), label=sol)
-                       for sol, idx in color_map.items()]
-            plt.legend(handles=handles, loc="lower right", title="Soluções")
-            plt.xlabel("Energia total (kWh)")
-            plt.ylabel("Delay médio (ms)")
-            plt.title("Eficiência: Energia × Delay (tamanho = Vazão em Mbps)")
-            plt.grid(True, linestyle=":")
-            plt.tight_layout()
-            plt.savefig(Path(out_root)/"comparacao_scatter_energia_delay_bolhas.png", dpi=300)
-            plt.close()
+            plot_scatter_energy_delay(
+                scatter_E, scatter_D, scatter_S, scatter_C, color_map,
+                Path(out_root)/"comparacao_scatter_energia_delay_bolhas.png"
+            )
 
 # ---------------------------
 # Main
@@ -471,8 +661,20 @@ def main():
     ap.add_argument("--charts",  nargs="+", default=["per-solution","comparisons"],
                     choices=CHART_CHOICES,
                     help="Tipos de gráfico: per-solution (linhas), comparisons (barras), scatter")
+    ap.add_argument("--preview", action="store_true",
+                    help=f"Renderiza em baixa resolução ({PREVIEW_DPI} dpi) em <out>/{PREVIEW_SUBDIR}/, "
+                         "sem alterar os PNGs finais")
+    ap.add_argument("--force-charts", action="store_true",
+                    help=f"Redesenha todos os gráficos, ignorando o {CHART_MANIFEST}")
+    ap.add_argument("--stream", action="store_true",
+                    help="Modo streaming para campanhas grandes: grava resumo_por_arquivo.jsonl "
+                         "à medida que lê os .sca e agrega em memória constante")
     args = ap.parse_args()
 
+    _chart_cfg["dpi"] = PREVIEW_DPI if args.preview else CHART_DPI
+    _chart_cfg["force"] = args.force_charts
+    _chart_cfg["preview"] = args.preview
+
     out_root = Path(args.out)
     ensure_dir(out_root)
 
@@ -487,11 +689,14 @@ def main():
     base = Path(args.base)
     for solution in args.solutions:
         td = process_topology(base/solution, ensure_dir(out_root/solution), energy_cfg,
-                              metrics=args.metrics, charts=args.charts)
+                              metrics=args.metrics, charts=args.charts, stream=args.stream)
         if td: topologies_data.append(td)
 
     comparisons_all_solutions(topologies_data, out_root, energy_cfg,
                               metrics=args.metrics, charts=args.charts)
 
+    print(f"[INFO] Gráficos: {_chart_stats['drawn']} gerados, "
+          f"{_chart_stats['skipped']} inalterados (dpi={_chart_cfg['dpi']}).")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re, json, argparse, math
+from pathlib import Path
+from collections import defaultdict
+
+# ---------------------------
+# Padrões
+# ---------------------------
+DEFAULT_OUT = "warmup_recomendado.json"
+DEFAULT_BIN_WIDTH = 0.1      # s (largura das janelas de tempo que viram observações)
+DEFAULT_REL_PRECISION = 0.05 # meia-largura do IC 95% / média
+DEFAULT_SAFETY = 1.2         # margem sobre o maior ponto de truncamento
+DEFAULT_MAX_FIRST_SAMPLE = 1.0  # s; série que começa depois disso indica piloto com warm-up
+
+MSER_BATCH = 5               # MSER-5
+CI_BATCHES = 10              # batch means para estimar a janela de medição
+T_975_9DF = 2.262            # t de Student (0.975, 9 g.l.) para CI_BATCHES = 10
+
+# métrica -> regex do nome do vetor (sem o sufixo ":vector")
+# cbrReceivedThroughput não entra: o CbrReceiver do Simu5G só o emite uma vez, no finish().
+METRIC_PATTERNS = {
+    "delay":      re.compile(r"^cbrFrameDelay(?::vector)?$"),
+    "proc":       re.compile(r"^CNProcDemand(?::vector)?$"),
+}
+
+# ---------------------------
+# Regex (.vec texto, OMNeT++ 5/6)
+# ---------------------------
+#   vector 3 Net.ue[0].app[0] cbrFrameDelay:vector ETV
+#   3	1234	0.5012	0.0031
+RE_VECTOR_DECL = re.compile(r"^vector\s+(\d+)\s+(\S+)\s+(\S+)(?:\s+([ETV]+))?\s*$")
+
+# ---------------------------
+# Leitura dos .vec
+# ---------------------------
+def find_vec_files(paths):
+    files = []
+    for raw in paths:
+        p = Path(raw)
+        if p.is_dir():
+            files.extend(sorted(p.rglob("*.vec")))
+        elif p.is_file():
+            files.append(p)
+        else:
+            print(f"[WARN] Não encontrado: {p}")
+    return files
+
+def read_vec_binned(vec: Path, bin_width: float):
+    """
+    Lê um .vec em texto linha a linha e agrega, por métrica, a média dos valores
+    (de todos os módulos) em janelas de `bin_width` segundos.
+    Retorna ({métrica: [(t_inicio, média), ...]}, t_final, {métrica: t_primeira_amostra}).
+    """
+    vec_metric, vec_cols = {}, {}
+    bins = defaultdict(lambda: defaultdict(lambda: [0.0, 0]))
+    t_first = {}
+    t_end = 0.0
+
+    with open(vec, errors="ignore") as f:
+        first = f.readline()
+        if first.startswith("SQLite format"):
+            raise ValueError(f"{vec}: .vec em SQLite não suportado (use outputvectormanager-class=omnetpp::envir::cIndexedFileOutputVectorManager)")
+        f.seek(0)
+        for line in f:
+            if not line or not line[0].isdigit():
+                m = RE_VECTOR_DECL.match(line)
+                if m:
+                    name = m.group(3)
+                    for metric, rx in METRIC_PATTERNS.items():
+                        if rx.match(name):
+                            vid = m.group(1)
+                            vec_metric[vid] = metric
+                            vec_cols[vid] = m.group(4) or "ETV"
+                            break
+                continue
+            parts = line.split()
+            metric = vec_metric.get(parts[0])
+            if metric is None:
+                continue
+            cols = vec_cols[parts[0]]
+            try:
+                t = float(parts[1 + cols.index("T")])
+                v = float(parts[1 + cols.index("V")])
+            except (ValueError, IndexError):
+                continue
+            if not math.isfinite(v):
+                continue
+            acc = bins[metric][int(t // bin_width)]
+            acc[0] += v
+            acc[1] += 1
+            t_first[metric] = min(t_first.get(metric, t), t)
+            t_end = max(t_end, t)
+
+    series = {
+        metric: [(idx * bin_width, s / n) for idx, (s, n) in sorted(by_bin.items())]
+        for metric, by_bin in bins.items()
+    }
+    return series, t_end, t_first
+
+# ---------------------------
+# MSER-5 e janela de medição
+# ---------------------------
+def mser_truncation(values, batch=MSER_BATCH):
+    """
+    Regra MSER-m (White, 1997) sobre médias de lotes de `batch` observações.
+    Retorna (nº de observações a descartar, truncou no limite n/2?) ou None se a série for curta.
+    """
+    batches = [sum(values[i:i+batch]) / batch for i in range(0, len(values) - batch + 1, batch)]
+    n = len(batches)
+    if n < 4:
+        return None
+
+    # somas a partir do fim: S[d] = sum(batches[d:]), Q[d] = sum(batches[d:]**2)
+    S, Q = [0.0] * (n + 1), [0.0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        S[i] = S[i + 1] + batches[i]
+        Q[i] = Q[i + 1] + batches[i] ** 2
+
+    best_d, best = 0, math.inf
+    for d in range(0, n // 2 + 1):
+        m = n - d
+        mean = S[d] / m
+        stat = max(Q[d] - m * mean * mean, 0.0) / (m * m)
+        if stat < best:
+            best_d, best = d, stat
+    return best_d * batch, best_d == n // 2
+
+def required_window(times, values, t_end, rel_precision):
+    """
+    Batch means (CI_BATCHES lotes no tempo) sobre a parte estacionária.
+    Estima a janela de medição para atingir `rel_precision` (meia-largura IC 95% / média).
+    """
+    if len(values) < CI_BATCHES or t_end <= times[0]:
+        return None
+    window = t_end - times[0]
+    k = len(values) // CI_BATCHES
+    means = [sum(values[i*k:(i+1)*k]) / k for i in range(CI_BATCHES)]
+    mean = sum(means) / CI_BATCHES
+    if mean == 0:
+        return None
+    var = sum((x - mean) ** 2 for x in means) / (CI_BATCHES - 1)
+    rel = T_975_9DF * math.sqrt(var / CI_BATCHES) / abs(mean)
+    return {
+        "mean": mean,
+        "rel_halfwidth": rel,
+        "window_req_s": window * (rel / rel_precision) ** 2,
+    }
+
+def analyze_pilot(vec: Path, bin_width: float, rel_precision: float,
+                  max_first_sample: float = DEFAULT_MAX_FIRST_SAMPLE):
+    """
+    `late_start` lista as séries (com amostras suficientes para o MSER) cuja primeira amostra vem após
+    `max_first_sample`: o OMNeT++ não grava vetores durante o warmup-period, então o piloto já tinha
+    warm-up e o transitório não aparece.
+    """
+    series, t_end, t_first = read_vec_binned(vec, bin_width)
+    report = {"file": str(vec), "pilot_end_s": t_end, "metrics": {}, "late_start": {}}
+    for metric, points in sorted(series.items()):
+        times = [t for t, _ in points]
+        values = [v for _, v in points]
+        res = mser_truncation(values)
+        if res is None:
+            report["metrics"][metric] = {"n_bins": len(values), "error": "série curta demais para MSER-5"}
+            continue
+        k, at_limit = res
+        if t_first[metric] > max_first_sample:
+            report["late_start"][metric] = t_first[metric]
+        trunc_s = times[k] if k < len(times) else t_end
+        entry = {
+            "n_bins": len(values),
+            "first_sample_s": t_first[metric],
+            "truncation_s": trunc_s,
+            "steady_state": not at_limit,
+        }
+        win = required_window(times[k:], values[k:], t_end, rel_precision)
+        if win:
+            entry.update(win)
+        report["metrics"][metric] = entry
+    return report
+
+def recommend(reports, safety: float, window: float | None, rel_precision: float):
+    """
+    Retorna a recomendação, None se nenhuma série foi truncada, ou levanta ValueError
+    se não for possível obter uma janela de medição positiva.
+    """
+    # só pilotos com ao menos uma série truncada (os demais têm pilot_end_s sem significado)
+    used = [r for r in reports if any("truncation_s" in m for m in r["metrics"].values())]
+    if not used:
+        return None
+    truncs = [m["truncation_s"] for r in used for m in r["metrics"].values() if "truncation_s" in m]
+    warmup = math.ceil(max(truncs) * safety * 10) / 10.0
+
+    if window is None:
+        reqs = [m["window_req_s"] for r in used for m in r["metrics"].values() if "window_req_s" in m]
+        if reqs:
+            # batch means com poucos dados subestima a variância: janela >= warm-up
+            window = max(max(reqs), warmup)
+        else:
+            # sem estimativa: mantém a janela estacionária observada no piloto mais curto
+            window = min(r["pilot_end_s"] for r in used) - warmup
+    if window <= 0:
+        raise ValueError(
+            f"janela de medição não positiva ({window:.3f}s) com warm-up de {warmup}s: "
+            "aumente a duração dos pilotos ou informe --window"
+        )
+    window = math.ceil(window * 10) / 10.0
+
+    return {
+        "method": f"MSER-{MSER_BATCH}",
+        "warmup_period_s": warmup,
+        "measurement_window_s": window,
+        "sim_time_limit_s": round(warmup + window, 1),
+        "safety": safety,
+        "rel_precision": rel_precision,
+        "non_stationary": [
+            f"{r['file']}:{name}" for r in reports for name, m in r["metrics"].items()
+            if m.get("steady_state") is False
+        ],
+        "pilots": reports,
+    }
+
+# ---------------------------
+# Main
+# ---------------------------
+def main():
+    ap = argparse.ArgumentParser(description="Detecta o warm-up (MSER-5) em .vec de execuções piloto e recomenda warmup-period/sim-time-limit.")
+    ap.add_argument("vec", nargs="+", help="Arquivos .vec ou pastas (busca recursiva por *.vec)")
+    ap.add_argument("--out", default=DEFAULT_OUT,
+                    help=f"JSON de recomendação, lido por run_simulations.py --warmup-json (default: {DEFAULT_OUT})")
+    ap.add_argument("--bin-width", type=float, default=DEFAULT_BIN_WIDTH,
+                    help=f"Largura (s) das janelas que viram observações da série (default: {DEFAULT_BIN_WIDTH})")
+    ap.add_argument("--safety", type=float, default=DEFAULT_SAFETY,
+                    help=f"Fator multiplicativo sobre o maior truncamento detectado (default: {DEFAULT_SAFETY})")
+    ap.add_argument("--window", type=float,
+                    help="Janela de medição (s) após o warm-up. Default: estimada por batch means para --rel-precision")
+    ap.add_argument("--rel-precision", type=float, default=DEFAULT_REL_PRECISION,
+                    help=f"Meia-largura relativa do IC 95%% desejada para as médias (default: {DEFAULT_REL_PRECISION})")
+    ap.add_argument("--max-first-sample", type=float, default=DEFAULT_MAX_FIRST_SAMPLE,
+                    help="Tempo máximo (s) da primeira amostra de cada série; acima disso o piloto é "
+                         f"considerado com warm-up e o detector falha (default: {DEFAULT_MAX_FIRST_SAMPLE})")
+    args = ap.parse_args()
+    if args.bin_width <= 0:
+        ap.error("--bin-width deve ser > 0")
+    if args.rel_precision <= 0:
+        ap.error("--rel-precision deve ser > 0")
+    if args.window is not None and args.window <= 0:
+        ap.error("--window deve ser > 0")
+    if args.safety < 1:
+        ap.error("--safety deve ser >= 1 (fator sobre o truncamento detectado)")
+    if args.max_first_sample < 0:
+        ap.error("--max-first-sample deve ser >= 0")
+
+    files =find_vec_files(args.vec)
+    if not files:
+        raise SystemExit("[ERRO] Nenhum .vec encontrado.")
+
+    reports = []
+    for vec in files:
+        try:
+            reports.append(analyze_pilot(vec, args.bin_width, args.rel_precision, args.max_first_sample))
+        except ValueError as e:
+            print(f"[WARN] {e}")
+
+    late = [f"{Path(r['file']).name}:{m} em {t:.3f}s" for r in reports for m, t in r["late_start"].items()]
+    if late:
+        raise SystemExit(
+            f"[ERRO] Séries começam após {args.max_first_sample}s ({', '.join(late)}): os pilotos parecem ter "
+            "warm-up e o transitório não foi gravado. Rode os pilotos com --warmup-period 0 "
+            "(ou ajuste --max-first-sample se a aplicação começa tarde)."
+        )
+
+    try:
+        rec = recommend(reports, args.safety, args.window, args.rel_precision)
+    except ValueError as e:
+        raise SystemExit(f"[ERRO] {e}")
+    if rec is None:
+        raise SystemExit("[ERRO] Nenhuma série de cbrFrameDelay/CNProcDemand utilizável nos .vec.")
+
+    with open(args.out, "w") as f:
+        json.dump(rec, f, indent=2, ensure_ascii=False)
+
+    for r in reports:
+        for name, m in r["metrics"].items():
+            if "truncation_s" in m:
+                flag = "" if m["steady_state"] else "  [WARN] truncamento no limite n/2 (piloto curto ou não estacionário)"
+                print(f"[INFO] {Path(r['file']).name} {name}: truncamento em {m['truncation_s']:.3f}s{flag}")
+    print(f"[INFO] Recomendado: warmup-period={rec['warmup_period_s']}s | sim-time-limit={rec['sim_time_limit_s']}s "
+          f"(janela de medição {rec['measurement_window_s']}s)")
+    print(f"[INFO] Use: run_simulations.py --warmup-json {args.out}")
+
+if __name__ == "__main__":
+    main()